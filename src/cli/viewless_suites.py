@@ -7,6 +7,7 @@ import os
 import yaml
 
 from src.utils.tags import remove_tags_from_test
+from src.utils.selector_roots import add_roots_to_selectors
 from src.utils.cli_args import normalize_paths_argument
 from fnmatch import fnmatch
 
@@ -31,10 +32,9 @@ def load_viewless_overrides():
         return yaml.safe_load(file)
 
 
-def write_viewless_overrides(content):
+def write_viewless_overrides(roots_by_selector):
     viewless_override_file = os.path.join(MDB_REPO, VIEWLESS_OVERRIDES_PATH)
-    with open(viewless_override_file, 'w') as file:
-        yaml.safe_dump(content, file, default_flow_style=False)
+    return add_roots_to_selectors(viewless_override_file, roots_by_selector)
 
 
 def get_validated_tests_selectors_map():
@@ -64,22 +64,19 @@ def get_validated_tests_selectors_map():
 
 
 def update_validated_tests_selectors(selector_map):
-    overrides = load_viewless_overrides()
+    roots_by_selector = dict()
 
     for selector_cat, selector in selector_map.items():
         selector_name = selector['validated_tests_selector_name']
-        for override in overrides:
-            if selector_name == override['name']:
-                if 'num_validated_tests_added' not in selector:
-                    logging.debug(f"Tests selector '{selector_name}' was not modified")
-                    continue
-                original_num_tests = selector['num_validated_tests']
-                final_num_tests = original_num_tests + selector['num_validated_tests_added']
-                logging.debug(f"Updating test selector '{selector_name}'. Number of tests increased from {original_num_tests} to {final_num_tests}")
-                selector['validated_tests'].sort()
-                override['value']['selector']['roots'] = selector['validated_tests']
-
-    write_viewless_overrides(overrides)
+        if 'num_validated_tests_added' not in selector:
+            logging.debug(f"Tests selector '{selector_name}' was not modified")
+            continue
+        original_num_tests = selector['num_validated_tests']
+        final_num_tests = original_num_tests + selector['num_validated_tests_added']
+        logging.debug(f"Updating test selector '{selector_name}'. Number of tests increased from {original_num_tests} to {final_num_tests}")
+        roots_by_selector[selector_name] = selector['validated_tests'][original_num_tests:]
+
+    write_viewless_overrides(roots_by_selector)
 
 
 def enable_tests_in_viewless_suites(tests, strict=False):
@@ -0,0 +1,329 @@
+import contextlib
+import logging
+
+from collections import Counter
+import os
+import re
+import tempfile
+import yaml
+
+logger = logging.getLogger(__name__)
+
+SPACE = "[ \t]"
+COMMENT_OR_BLANK_REGEX = rf"^{SPACE}*(?:#.*)?$"
+
+
+def key_regex(key):
+    return rf"^(?P<indent>{SPACE}*){re.escape(key)}:(?P<value>.*)$"
+
+
+def has_inline_value(key_match):
+    value = key_match.group('value').strip()
+    return bool(value) and not value.startswith('#')
+LIST_ITEM_REGEX = rf"^(?P<indent>{SPACE}*)-{SPACE}+(?P<value>.*)$"
+
+
+def selector_name_regex(selector_name):
+    quoted_name = rf"(?P<quote>['\"]?){re.escape(selector_name)}(?P=quote)"
+    return rf"^(?P<indent>{SPACE}*)-{SPACE}+name:{SPACE}*{quoted_name}{SPACE}*(?:#.*)?$"
+
+
+def indent_of(line):
+    return len(line) - len(line.lstrip(' \t'))
+
+
+def check_root(root, selector_name):
+    # roots are compared to the new test paths to keep the list sorted
+    if not isinstance(root, str):
+        raise Exception(f"Unsupported roots value '{root}' in override '{selector_name}'")
+    return root
+
+
+def find_child_key(lines, parent_idx, parent_indent, key, child_indent=None):
+    """
+    Find the line of `key` among the direct children of the mapping at lines[parent_idx].
+    The children indent is the one of the first non-comment line following the parent,
+    unless child_indent is given. Return (line_idx, match), or (None, None) if not found.
+    """
+    for idx in range(parent_idx + 1, len(lines)):
+        line = lines[idx][2]
+        if re.match(COMMENT_OR_BLANK_REGEX, line):
+            continue
+        line_indent = indent_of(line)
+        if line_indent <= parent_indent:
+            # reached the end of the parent mapping
+            break
+        if child_indent is None:
+            child_indent = line_indent
+        if line_indent != child_indent:
+            continue
+        key_match = re.match(key_regex(key), line)
+        if key_match:
+            return idx, key_match
+    return None, None
+
+
+def split_lines(content):
+    """
+    Split content in lines, returning (start_offset, end_offset, line) tuples.
+    The end offset includes the line terminator, the line itself does not.
+    """
+    offset = 0
+    for raw_line in content.splitlines(keepends=True):
+        yield offset, offset + len(raw_line), raw_line.rstrip('\r\n')
+        offset += len(raw_line)
+
+
+class SelectorRoots:
+    """
+    Location of the `roots` list of a selector inside an overrides file.
+    `items` is the list of (leading_comments_offset, start_offset, end_offset, root) tuples
+    of every block style list entry, where leading_comments_offset is the start of the comment
+    lines directly above the entry (or start_offset if there are none).
+    When the roots value is a flow sequence or is empty, `items` is empty, `flow_roots` holds
+    the parsed roots and `roots_line` is the (start_offset, end_offset, line) of the `roots:` line,
+    which gets rewritten as a block list.
+    """
+    def __init__(self, selector_name: str, item_indent: str, items: list, flow_roots: list = None, roots_line: tuple = None):
+        self.selector_name = selector_name
+        self.item_indent = item_indent
+        self.items = items
+        self.flow_roots = flow_roots if flow_roots is not None else []
+        self.roots_line = roots_line
+
+    @staticmethod
+    def from_content(content: str, selector_name: str):
+        lines = list(split_lines(content))
+
+        override_idx = None
+        for idx, (_, _, line) in enumerate(lines):
+            if re.match(selector_name_regex(selector_name), line):
+                override_idx = idx
+                break
+        if override_idx is None:
+            raise Exception(f"Could not find override '{selector_name}'")
+        override_indent = indent_of(lines[override_idx][2])
+
+        # look for `value.selector.roots`, `value` being a sibling of `name` in the override mapping
+        name_column = re.match(rf"^{SPACE}*-{SPACE}+", lines[override_idx][2]).end()
+        value_idx, value_match = find_child_key(lines, override_idx, override_indent, 'value', name_column)
+        if value_idx is None or has_inline_value(value_match):
+            raise Exception(f"Could not find value mapping in override '{selector_name}'")
+        selector_idx, selector_match = find_child_key(lines, value_idx, indent_of(lines[value_idx][2]), 'selector')
+        if selector_idx is None or has_inline_value(selector_match):
+            raise Exception(f"Could not find selector mapping in override '{selector_name}'")
+        roots_idx, roots_match = find_child_key(lines, selector_idx, indent_of(lines[selector_idx][2]), 'roots')
+        if roots_idx is None:
+            raise Exception(f"Could not find roots list in override '{selector_name}'")
+        roots_indent = roots_match.group('indent')
+
+        roots_value = roots_match.group('value').strip()
+        if has_inline_value(roots_match):
+            # flow style roots list (e.g. `roots: []`)
+            try:
+                flow_roots = yaml.safe_load(roots_value)
+            except yaml.YAMLError as ex:
+                raise Exception(f"Unsupported roots value '{roots_value}' in override '{selector_name}'") from ex
+            if not isinstance(flow_roots, list):
+                raise Exception(f"Unsupported roots value '{roots_value}' in override '{selector_name}'")
+            for root in flow_roots:
+                check_root(root, selector_name)
+            logger.debug(f"Found {len(flow_roots)} flow style roots in override '{selector_name}'")
+            return SelectorRoots(selector_name, roots_indent, [], flow_roots, lines[roots_idx])
+
+        item_indent = None
+        items = []
+        comments_start = None
+        for start, end, line in lines[roots_idx + 1:]:
+            if not line.strip():
+                comments_start = None
+                continue
+            if re.match(COMMENT_OR_BLANK_REGEX, line):
+                if comments_start is None:
+                    comments_start = start
+                continue
+            line_indent = indent_of(line)
+            if item_indent is not None and line_indent > len(item_indent):
+                # continuation of a multi-line list entry
+                lead_start, item_start, _, _ = items[-1]
+                root = check_root(yaml.safe_load(content[item_start:end])[0], selector_name)
+                items[-1] = (lead_start, item_start, end, root)
+                comments_start = None
+                continue
+            item_match = re.match(LIST_ITEM_REGEX, line)
+            if not item_match or line_indent < len(roots_indent):
+                break
+            if item_indent is None:
+                item_indent = item_match.group('indent')
+            elif item_match.group('indent') != item_indent:
+                break
+            lead_start = comments_start if comments_start is not None else start
+            root = check_root(yaml.safe_load(item_match.group('value')), selector_name)
+            items.append((lead_start, start, end, root))
+            comments_start = None
+
+        if item_indent is None:
+            # `roots:` without any value, rewrite it as a block list
+            logger.debug(f"Found empty roots in override '{selector_name}'")
+            return SelectorRoots(selector_name, roots_indent, [], [], lines[roots_idx])
+        logger.debug(f"Found {len(items)} roots in override '{selector_name}'")
+        return SelectorRoots(selector_name, item_indent, items)
+
+    def roots(self):
+        if self.roots_line:
+            return list(self.flow_roots)
+        return [root for _, _, _, root in self.items]
+
+    def missing_roots(self, new_roots: list):
+        existing_roots = set(self.roots())
+        return [root for root in sorted(set(new_roots)) if root not in existing_roots]
+
+    def serialize_root(self, root, newline):
+        serialized = yaml.safe_dump([root], default_flow_style=False, width=float('inf')).rstrip('\n')
+        return f"{self.item_indent}{serialized}{newline}"
+
+    def serialize_roots_line(self, roots, newline):
+        _, _, line = self.roots_line
+        value = re.match(key_regex('roots'), line).group('value')
+        if value.strip() and not value.strip().startswith('#'):
+            # keep the comment following the flow sequence
+            sequence_ends = [event.end_mark.index for event in yaml.parse(value, Loader=yaml.SafeLoader)
+                             if isinstance(event, yaml.SequenceEndEvent)]
+            value = value[sequence_ends[-1]:]
+        comment = value.strip()
+        header = f"{self.item_indent}roots:" + (f" {comment}" if comment.startswith('#') else "")
+        return header + newline + "".join(self.serialize_root(root, newline) for root in roots)
+
+    def insertions(self, new_roots: list, newline: str = '\n'):
+        """
+        Return the list of (start_offset, end_offset, text) edits needed to add `new_roots` to this roots list.
+        Each new root is placed before the first existing entry that sorts after it
+        (and before the comments attached to that entry), so that already sorted lists stay sorted.
+        A flow style or empty roots value is replaced by a block list.
+        """
+        missing_roots = self.missing_roots(new_roots)
+        if not missing_roots:
+            return []
+
+        if self.roots_line:
+            roots = list(self.flow_roots)
+            for root in missing_roots:
+                idx = next((idx for idx, existing in enumerate(roots) if existing > root), len(roots))
+                roots.insert(idx, root)
+            start, end, _ = self.roots_line
+            return [(start, end, self.serialize_roots_line(roots, newline))]
+
+        edits = []
+        for root in missing_roots:
+            offset = next((lead_start for lead_start, _, _, existing in self.items if existing > root), self.items[-1][2])
+            edits.append((offset, offset, self.serialize_root(root, newline)))
+        return edits
+
+
+def detect_newline(content):
+    return '\r\n' if '\r\n' in content else '\n'
+
+
+def apply_edits(content: str, edits: list):
+    """
+    Apply the given list of (start_offset, end_offset, text) edits to content,
+    replacing content[start_offset:end_offset] by text. Edits must not overlap.
+    Insertions at the same offset are applied in the given order.
+    """
+    chunks = []
+    last_offset = 0
+    for start, end, text in sorted(edits, key=lambda edit: edit[0]):
+        chunks.append(content[last_offset:start])
+        if end == len(content) and content and not content.endswith('\n'):
+            if start == end:
+                # inserting after a last line without line terminator
+                text = detect_newline(content) + text.rstrip('\r\n')
+            else:
+                # replacing a last line without line terminator
+                text = text.rstrip('\r\n')
+        chunks.append(text)
+        last_offset = end
+    chunks.append(content[last_offset:])
+    return "".join(chunks)
+
+
+def insert_selectors_roots(content: str, roots_by_selector: dict):
+    newline = detect_newline(content)
+    edits = []
+    num_roots_added = 0
+    for selector_name, new_roots in roots_by_selector.items():
+        selector_roots = SelectorRoots.from_content(content, selector_name)
+        num_selector_roots_added = len(selector_roots.missing_roots(new_roots))
+        logger.debug(f"Inserting {num_selector_roots_added} roots in '{selector_name}'")
+        edits.extend(selector_roots.insertions(new_roots, newline))
+        num_roots_added += num_selector_roots_added
+    if not edits:
+        return content, 0
+
+    new_content = apply_edits(content, edits)
+    check_selectors_roots(content, new_content, roots_by_selector)
+    return new_content, num_roots_added
+
+
+def load_overrides(content):
+    return {item['name']: item['value'] for item in yaml.safe_load(content)}
+
+
+def check_selectors_roots(content: str, new_content: str, roots_by_selector: dict):
+    """
+    Check that new_content parses to the same overrides as content,
+    except for the given roots that have been added to the selectors.
+    """
+    try:
+        overrides = load_overrides(content)
+        new_overrides = load_overrides(new_content)
+        for selector_name, new_roots in roots_by_selector.items():
+            old_roots = overrides[selector_name]['selector']['roots'] or []
+            expected_roots = old_roots + [root for root in sorted(set(new_roots)) if root not in old_roots]
+            actual_roots = new_overrides[selector_name]['selector']['roots']
+            if Counter(actual_roots) != Counter(expected_roots):
+                raise Exception(f"Unexpected roots {actual_roots} in override '{selector_name}', expected {expected_roots}")
+            overrides[selector_name]['selector']['roots'] = actual_roots
+    except (yaml.YAMLError, KeyError, TypeError) as ex:
+        raise Exception("Edited overrides are not valid") from ex
+    if overrides != new_overrides:
+        raise Exception("Edited overrides differ from the original ones outside of the selectors roots")
+
+
+def write_file_atomically(file, content):
+    directory = os.path.dirname(os.path.abspath(file))
+    fd, tmp_file = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file)}.", suffix='.tmp')
+    try:
+        try:
+            f = os.fdopen(fd, 'w', newline='')
+        except BaseException:
+            os.close(fd)
+            raise
+        with f:
+            f.write(content)
+        if os.path.exists(file):
+            os.chmod(tmp_file, os.stat(file).st_mode & 0o7777)
+        os.replace(tmp_file, file)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_file)
+        raise
+
+
+def add_roots_to_selectors(file: str, roots_by_selector: dict):
+    """
+    Add the given roots to the `roots` lists of the selectors in the given overrides file.
+    Only the new list entries are spliced in, the rest of the file is left untouched.
+    The edited content is parsed back and checked before being written,
+    and the file is rewritten only if at least one root was added.
+    """
+    try:
+        with open(file, 'r', newline='') as f:
+            content = f.read()
+
+        new_content, num_roots_added = insert_selectors_roots(content, roots_by_selector)
+        if num_roots_added:
+            write_file_atomically(file, new_content)
+        return num_roots_added
+    except Exception as ex:
+        raise Exception(f"Failed to add roots to selectors in file '{file}'") from ex
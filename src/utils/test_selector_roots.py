@@ -0,0 +1,304 @@
+import pytest
+import yaml
+
+from src.utils.selector_roots import SelectorRoots, add_roots_to_selectors, apply_edits, insert_selectors_roots
+
+SELECTOR = "only_validated_core_timeseries_tests_selector"
+
+
+def selector_roots(content, selector_name=SELECTOR):
+    overrides = {item['name']: item['value'] for item in yaml.safe_load(content)}
+    return overrides[selector_name]['selector']['roots']
+
+
+def test_empty_flow_roots():
+    content = (
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    selector:\n"
+        "      roots: []\n"
+        "      exclude_with_any_tags:\n"
+        "      - foo\n"
+    )
+    new_content, num_added = insert_selectors_roots(content, {SELECTOR: ["b.js", "a.js"]})
+    assert num_added == 2
+    assert new_content == (
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    selector:\n"
+        "      roots:\n"
+        "      - a.js\n"
+        "      - b.js\n"
+        "      exclude_with_any_tags:\n"
+        "      - foo\n"
+    )
+    assert selector_roots(new_content) == ["a.js", "b.js"]
+
+
+def test_flow_roots_with_comment():
+    content = (
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    selector:\n"
+        "      roots: [c.js, 'e.js']  # flow\n"
+    )
+    new_content, num_added = insert_selectors_roots(content, {SELECTOR: ["d.js", "c.js", "a.js"]})
+    assert num_added == 2
+    assert "roots: # flow\n" in new_content
+    assert selector_roots(new_content) == ["a.js", "c.js", "d.js", "e.js"]
+
+
+def test_flow_roots_with_brackets_in_comment():
+    content = (
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    selector:\n"
+        "      roots: ['a.js', \"b].js\"]  # see [x] note\n"
+    )
+    new_content, num_added = insert_selectors_roots(content, {SELECTOR: ["c.js"]})
+    assert num_added == 1
+    assert "      roots: # see [x] note\n" in new_content
+    assert selector_roots(new_content) == ["a.js", "b].js", "c.js"]
+
+
+def test_null_roots():
+    content = (
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    selector:\n"
+        "      roots:\n"
+        "      exclude_files:\n"
+        "      - x.js\n"
+    )
+    new_content, num_added = insert_selectors_roots(content, {SELECTOR: ["a.js"]})
+    assert num_added == 1
+    assert selector_roots(new_content) == ["a.js"]
+    assert yaml.safe_load(new_content)[0]['value']['selector']['exclude_files'] == ["x.js"]
+
+
+def test_zero_indented_sequence_with_sibling_keys():
+    content = (
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    selector:\n"
+        "      roots:\n"
+        "      - b.js\n"
+        "      - d.js\n"
+        "      exclude_files:\n"
+        "      - z.js\n"
+    )
+    new_content, num_added = insert_selectors_roots(content, {SELECTOR: ["e.js", "a.js", "c.js", "b.js"]})
+    assert num_added == 3
+    assert new_content == (
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    selector:\n"
+        "      roots:\n"
+        "      - a.js\n"
+        "      - b.js\n"
+        "      - c.js\n"
+        "      - d.js\n"
+        "      - e.js\n"
+        "      exclude_files:\n"
+        "      - z.js\n"
+    )
+    assert yaml.safe_load(new_content)[0]['value']['selector']['exclude_files'] == ["z.js"]
+
+
+def test_indented_sequence_with_comments():
+    content = (
+        "# header comment\n"
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    selector:\n"
+        "      roots:\n"
+        "        # first\n"
+        "        - b.js\n"
+        "\n"
+        "        # quoted\n"
+        "        - \"d.js\"  # trailing\n"
+        "        # after\n"
+        "      exclude_with_any_tags:\n"
+        "        - foo\n"
+    )
+    new_content, num_added = insert_selectors_roots(content, {SELECTOR: ["a.js", "c.js", "e.js"]})
+    assert num_added == 3
+    assert new_content == (
+        "# header comment\n"
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    selector:\n"
+        "      roots:\n"
+        "        - a.js\n"
+        "        # first\n"
+        "        - b.js\n"
+        "\n"
+        "        - c.js\n"
+        "        # quoted\n"
+        "        - \"d.js\"  # trailing\n"
+        "        - e.js\n"
+        "        # after\n"
+        "      exclude_with_any_tags:\n"
+        "        - foo\n"
+    )
+    assert selector_roots(new_content) == ["a.js", "b.js", "c.js", "d.js", "e.js"]
+
+
+def test_multi_line_entry():
+    content = (
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    selector:\n"
+        "      roots:\n"
+        "      - a.js\n"
+        "      - c\n"
+        "        .js\n"
+        "      exclude_files: []\n"
+    )
+    new_content, num_added = insert_selectors_roots(content, {SELECTOR: ["b.js", "d.js", "c .js"]})
+    assert num_added == 2
+    assert selector_roots(new_content) == ["a.js", "b.js", "c .js", "d.js"]
+
+
+def test_crlf_and_missing_final_newline():
+    content = (
+        f"- name: {SELECTOR}\r\n"
+        "  value:\r\n"
+        "    selector:\r\n"
+        "      roots:\r\n"
+        "      - a.js"
+    )
+    new_content, num_added = insert_selectors_roots(content, {SELECTOR: ["b.js"]})
+    assert num_added == 1
+    assert new_content == content + "\r\n      - b.js"
+    assert selector_roots(new_content) == ["a.js", "b.js"]
+
+
+def test_multiple_selectors():
+    other_selector = "only_validated_sharding_timeseries_tests_selector"
+    content = (
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    selector:\n"
+        "      roots:\n"
+        "      - b.js\n"
+        f"- name: {other_selector}\n"
+        "  value:\n"
+        "    selector:\n"
+        "      roots:\n"
+        "      - y.js\n"
+    )
+    new_content, num_added = insert_selectors_roots(content, {SELECTOR: ["c.js"], other_selector: ["x.js", "z.js"]})
+    assert num_added == 3
+    assert selector_roots(new_content) == ["b.js", "c.js"]
+    assert selector_roots(new_content, other_selector) == ["x.js", "y.js", "z.js"]
+
+
+def test_nothing_to_add():
+    content = (
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    selector:\n"
+        "      roots:\n"
+        "      - a.js\n"
+    )
+    assert insert_selectors_roots(content, {SELECTOR: ["a.js"]}) == (content, 0)
+
+
+def test_missing_selector():
+    with pytest.raises(Exception, match="Could not find override"):
+        insert_selectors_roots("- name: other\n  value: {}\n", {SELECTOR: ["a.js"]})
+
+
+def test_apply_edits():
+    content = "a\nc\nd"
+    edits = [(4, 5, "D"), (2, 2, "b1\n"), (2, 2, "b2\n"), (0, 0, "0\n")]
+    assert apply_edits(content, edits) == "0\na\nb1\nb2\nc\nD"
+    assert apply_edits(content, [(5, 5, "e\n")]) == "a\nc\nd\ne"
+    assert apply_edits(content, []) == content
+
+
+def test_add_roots_to_selectors(tmp_path):
+    overrides_file = tmp_path / "viewless_timeseries.yml"
+    content = (
+        "# keep this comment\n"
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    selector:\n"
+        "      roots:\n"
+        "      - b.js\n"
+    )
+    overrides_file.write_text(content)
+    assert add_roots_to_selectors(str(overrides_file), {SELECTOR: ["a.js"]}) == 1
+    assert overrides_file.read_text() == content.replace("      - b.js", "      - a.js\n      - b.js")
+
+    mtime = overrides_file.stat().st_mtime_ns
+    assert add_roots_to_selectors(str(overrides_file), {SELECTOR: ["a.js", "b.js"]}) == 0
+    assert overrides_file.stat().st_mtime_ns == mtime
+    assert [path.name for path in tmp_path.iterdir()] == ["viewless_timeseries.yml"]
+
+
+def test_long_root_with_spaces():
+    long_root = "jstests/core/" + "dir with spaces/" * 6 + "x.js"
+    content = (
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    selector:\n"
+        "      roots:\n"
+        "      - a.js\n"
+    )
+    new_content, num_added = insert_selectors_roots(content, {SELECTOR: [long_root]})
+    assert num_added == 1
+    assert new_content == content + f"      - {long_root}\n"
+    assert selector_roots(new_content) == ["a.js", long_root]
+
+
+def test_broken_splice_leaves_file_untouched(tmp_path, monkeypatch):
+    overrides_file = tmp_path / "viewless_timeseries.yml"
+    content = (
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    selector:\n"
+        "      roots:\n"
+        "      - b.js\n"
+    )
+    overrides_file.write_text(content)
+    monkeypatch.setattr(SelectorRoots, "serialize_root", lambda self, root, newline: f"{self.item_indent}- {root}\n  broken: [\n")
+    with pytest.raises(Exception, match="Failed to add roots"):
+        add_roots_to_selectors(str(overrides_file), {SELECTOR: ["a.js"]})
+    assert overrides_file.read_text() == content
+    assert [path.name for path in tmp_path.iterdir()] == ["viewless_timeseries.yml"]
+
+
+def test_roots_outside_of_selector():
+    content = (
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    executor:\n"
+        "      config:\n"
+        "        roots: [z.js]\n"
+        "    selector:  # selected tests\n"
+        "      exclude_files:\n"
+        "        roots:\n"
+        "        - y.js\n"
+        "      roots:\n"
+        "      - b.js\n"
+    )
+    new_content, num_added = insert_selectors_roots(content, {SELECTOR: ["a.js"]})
+    assert num_added == 1
+    assert selector_roots(new_content) == ["a.js", "b.js"]
+    new_value = yaml.safe_load(new_content)[0]['value']
+    assert new_value['executor']['config']['roots'] == ["z.js"]
+    assert new_value['selector']['exclude_files'] == {'roots': ["y.js"]}
+
+
+@pytest.mark.parametrize("roots", ["\n      - a.js\n      - 1\n", "\n      - yes\n", " [a.js, 1]\n"])
+def test_non_string_roots(roots):
+    content = (
+        f"- name: {SELECTOR}\n"
+        "  value:\n"
+        "    selector:\n"
+        f"      roots:{roots}"
+    )
+    with pytest.raises(Exception, match="Unsupported roots value"):
+        insert_selectors_roots(content, {SELECTOR: ["b.js"]})